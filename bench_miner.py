@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the idiom miner and the corpus extractor.
+
+    python bench_miner.py [--lines N] [--langs en tr el ru] [--inject RATE] [--seed S]
+                          [--workers N] [--stages clean_tokens check_match ...]
+
+Generates deterministic synthetic {lang}.txt files (and a Moses zip per
+language) under BENCH_DIR, reused by later runs with the same settings, then
+times each stage separately in a fresh process:
+
+    clean_tokens        tokenizing every candidate line
+    check_match         the reference matcher, every line against every idiom
+    process_language    the full miner (no result cache)
+    extract_from_moses_zip
+    count
+
+Lines/sec, MB/sec and the stage process's peak RSS are printed and appended
+as one JSON record per run to RESULTS_FILE (next to the corpora, out of the
+tree), so runs can be compared.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+
+import idiom_miner_dictionary as miner
+
+# Config
+BENCH_DIR = Path("data/_bench")
+RESULTS_FILE = BENCH_DIR / "bench_results.jsonl"
+STAGES = ["clean_tokens", "check_match", "process_language", "extract_from_moses_zip", "count"]
+VOCAB_SIZE = 20_000
+WORDS_MU, WORDS_SIGMA = 1.7, 0.55  # Log-normal words per line: median ~5.5, long tail
+STOPWORD_RATE = 0.3                # Share of words drawn from STOPWORDS
+WRITE_BLOCK = 20_000               # Lines per write while generating
+MB = 1024 * 1024
+
+ALPHABETS = {
+    "el": "αβγδεζηθικλμνξοπρστυφχψωάέήίόύώ",
+    "ru": "абвгдежзийклмнопрстуфхцчшщъыьэюя",
+}
+ENDINGS = [".", ".", ".", "?", "!", "...", ",", ""]
+
+# --- SYNTHETIC CORPUS ---
+
+def corpus_dir(lines, seed, inject):
+    return BENCH_DIR / f"{lines}_{seed}_{inject}"
+
+def alphabet(lang):
+    """Letters for filler words: the script of the language, else the letters of its idioms."""
+    if lang in ALPHABETS:
+        return ALPHABETS[lang]
+    text = " ".join(miner.IDIOMS[lang]) + " ".join(miner.STOPWORDS.get(lang, ()))
+    return "".join(sorted({ch for ch in text.lower() if ch.isalpha()}))
+
+def make_vocab(rng, letters):
+    vocab = set()
+    while len(vocab) < VOCAB_SIZE:
+        # Mostly 3-7 letters, like real word lengths
+        n = max(1, min(14, round(rng.gauss(5, 2))))
+        vocab.add("".join(rng.choice(letters) for _ in range(n)))
+    return sorted(vocab)
+
+def generate_lines(lang, n_lines, seed, inject):
+    """Yields n_lines synthetic subtitle lines; the same arguments always give the same lines."""
+    rng = random.Random(f"{lang}:{seed}")
+    vocab = make_vocab(rng, alphabet(lang))
+    rng.shuffle(vocab)
+    # Zipf-like word frequencies
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    stops = sorted(miner.STOPWORDS.get(lang, ())) or vocab[:10]
+    idioms = miner.IDIOMS[lang]
+    for _ in range(n_lines):
+        n = max(1, min(20, round(math.exp(rng.gauss(WORDS_MU, WORDS_SIGMA)))))
+        words = [rng.choice(stops) if rng.random() < STOPWORD_RATE else w
+                 for w in rng.choices(vocab, cum_weights=cum_weights, k=n)]
+        if rng.random() < inject:
+            phrase = rng.choice(idioms).split()
+            if rng.random() < 0.3:
+                # Inflected last word, as in agglutinative languages
+                phrase[-1] += rng.choice(vocab)[:2]
+            at = rng.randint(0, len(words))
+            words[at:at] = phrase
+        line = " ".join(words)
+        line = line[:1].upper() + line[1:] + rng.choice(ENDINGS)
+        if rng.random() < 0.15:
+            line = "- " + line  # Dialogue dash
+        yield line
+
+def generate(lang, n_lines, seed, inject):
+    """Writes {lang}.txt and a Moses zip for it, unless this run's settings already exist."""
+    out_dir = corpus_dir(n_lines, seed, inject) / lang
+    txt = out_dir / f"{lang}.txt"
+    moses = out_dir / f"bench-{lang}.txt.zip"
+    if txt.exists() and moses.exists():
+        return txt, moses
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Generating {n_lines:,} {lang} lines -> {txt}")
+    t0 = time.perf_counter()
+    tmp_txt, tmp_moses = txt.with_suffix(".tmp"), moses.with_suffix(".tmp")
+    with open(tmp_txt, "w", encoding="utf-8", newline="\n") as f_txt, \
+         zipfile.ZipFile(tmp_moses, "w", zipfile.ZIP_DEFLATED) as zf, \
+         zf.open(f"bench-{lang}.txt", "w", force_zip64=True) as f_moses:
+        batch = []
+        for line in generate_lines(lang, n_lines, seed, inject):
+            batch.append(line)
+            if len(batch) >= WRITE_BLOCK:
+                write_batch(f_txt, f_moses, batch)
+        write_batch(f_txt, f_moses, batch)
+    tmp_txt.replace(txt)
+    tmp_moses.replace(moses)
+    print(f"  {txt.stat().st_size / MB:,.1f} MB in {time.perf_counter() - t0:.1f}s")
+    return txt, moses
+
+def write_batch(f_txt, f_moses, batch):
+    if not batch:
+        return
+    f_txt.write("\n".join(batch) + "\n")
+    # Source side: the same words reversed, so both columns look alike
+    f_moses.write("".join(f"{' '.join(reversed(l.split()))} ||| {l}\n" for l in batch).encode("utf-8"))
+    batch.clear()
+
+# --- STAGES (each runs in its own process) ---
+
+def _peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / MB if sys.platform == "darwin" else rss / 1024
+
+def run_stage(stage, lang, txt, moses, workers):
+    """Times one stage; returns (seconds, lines, bytes, peak RSS MB)."""
+    if stage in ("clean_tokens", "check_match"):
+        lines = list(miner.CorpusReader(txt))
+        size = sum(len(l.encode("utf-8")) for l in lines)
+        if stage == "clean_tokens":
+            t0 = time.perf_counter()
+            for line in lines:
+                miner.clean_tokens(line, lang)
+            elapsed = time.perf_counter() - t0
+        else:
+            tokenized = [miner.clean_tokens(line, lang) for line in lines]
+            anchors = [miner.get_anchors(phrase, lang) for phrase in miner.IDIOMS[lang]]
+            t0 = time.perf_counter()
+            for line_tokens in tokenized:
+                for idiom_anchors in anchors:
+                    miner.check_match(line_tokens, idiom_anchors)
+            elapsed = time.perf_counter() - t0
+        return elapsed, len(lines), size, _peak_rss_mb()
+
+    if stage == "process_language":
+        miner.BASE_DIR = txt.parent.parent
+        t0 = time.perf_counter()
+        res = miner.process_language(lang, workers)
+        return time.perf_counter() - t0, res["lines"], txt.stat().st_size, _peak_rss_mb()
+
+    import download_opensubs_dual_mirror as extractor
+    if stage == "extract_from_moses_zip":
+        out = txt.with_suffix(".extracted")
+        with zipfile.ZipFile(moses) as zf:
+            size = zf.infolist()[0].file_size
+        t0 = time.perf_counter()
+        lines = extractor.extract_from_moses_zip(moses, out, 1)
+        elapsed = time.perf_counter() - t0
+        out.unlink(missing_ok=True)
+        extractor.stats_path(out).unlink(missing_ok=True)
+        return elapsed, lines, size, _peak_rss_mb()
+
+    if stage == "count":
+        t0 = time.perf_counter()
+        lines, _ = extractor.count(txt)
+        return time.perf_counter() - t0, lines, txt.stat().st_size, _peak_rss_mb()
+
+    raise ValueError(f"unknown stage {stage}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the miner and extractor on synthetic corpora.")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="lines per synthetic corpus")
+    parser.add_argument("--langs", nargs="+", default=["en", "tr", "el", "ru"], choices=list(miner.IDIOMS))
+    parser.add_argument("--inject", type=float, default=0.002, help="share of lines carrying an idiom")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="workers for process_language")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    corpora = {lang: generate(lang, args.lines, args.seed, args.inject) for lang in args.langs}
+
+    results = []
+    print(f"\n{'lang':<5} {'stage':<24} {'seconds':>8} {'lines/s':>12} {'MB/s':>8} {'peak RSS':>9}")
+    # A fresh process per stage, so peak RSS belongs to that stage alone
+    spawn = multiprocessing.get_context("spawn")
+    for lang, (txt, moses) in corpora.items():
+        for stage in args.stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                elapsed, lines, size, rss = pool.submit(run_stage, stage, lang, txt, moses, args.workers).result()
+            elapsed = max(elapsed, 1e-9)
+            row = {
+                "lang": lang, "stage": stage, "seconds": round(elapsed, 4), "lines": lines,
+                "mb": round(size / MB, 3), "lines_per_sec": round(lines / elapsed, 1),
+                "mb_per_sec": round(size / MB / elapsed, 3), "peak_rss_mb": round(rss, 1),
+            }
+            results.append(row)
+            print(f"{lang:<5} {stage:<24} {elapsed:>8.2f} {row['lines_per_sec']:>12,.0f} "
+                  f"{row['mb_per_sec']:>8.1f} {rss:>7.0f}MB")
+
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": miner.np is not None,
+        "params": {"lines": args.lines, "inject": args.inject, "seed": args.seed, "workers": args.workers},
+        "results": results,
+    }
+    RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {RESULTS_FILE}")
+
+if __name__ == "__main__":
+    main()
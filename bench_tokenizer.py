@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: lines/sec of the miner's tokenizer against the original
+per-punctuation replace loop, for every language in IDIOMS.
+
+Uses the first SAMPLE_LINES candidate lines of data/opensubs_raw/by_lang/{lang}/{lang}.txt
+when the corpus is present, otherwise a synthetic sample built from the idioms.
+"""
+import random
+import string
+import sys
+import time
+
+from idiom_miner_dictionary import IDIOMS, STOPWORDS, BASE_DIR, CorpusReader, get_tokenizer
+
+# Config
+SAMPLE_LINES = 200_000
+REPEATS = 3  # Best of N timings
+
+def legacy_clean_tokens(text, lang):
+    """The original clean_tokens: one str.replace per ASCII punctuation char."""
+    text = text.lower()
+    for char in string.punctuation:
+        text = text.replace(char, " ")
+    tokens = text.split()
+    stops = STOPWORDS.get(lang, set())
+    return [t for t in tokens if t not in stops]
+
+def sample_lines(lang):
+    file_path = BASE_DIR / lang / f"{lang}.txt"
+    if file_path.exists():
+        lines = []
+        for line in CorpusReader(file_path):
+            lines.append(line)
+            if len(lines) >= SAMPLE_LINES:
+                break
+        return lines, "corpus"
+
+    # Synthetic: idiom fragments mixed with subtitle-style punctuation
+    rng = random.Random(lang)
+    words = [w for phrase in IDIOMS[lang] for w in phrase.split()] + sorted(STOPWORDS.get(lang, ()))
+    marks = [",", ".", "?", "!", "...", " -", "…", "«", "»", "♪", "\""]
+    lines = []
+    for _ in range(SAMPLE_LINES):
+        n = rng.randint(2, 12)
+        line = " ".join(rng.choice(words) for _ in range(n))
+        lines.append(line.capitalize() + rng.choice(marks))
+    return lines, "synthetic"
+
+def lines_per_sec(func, lines, lang):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        for line in lines:
+            func(line, lang)
+        best = min(best, time.perf_counter() - t0)
+    return len(lines) / best
+
+def main():
+    langs = sys.argv[1:] or list(IDIOMS.keys())
+    print(f"{'lang':<5} {'source':<10} {'legacy l/s':>12} {'new l/s':>12} {'speedup':>8} {'same tokens':>12}")
+
+    for lang in langs:
+        lines, source = sample_lines(lang)
+        tokenize = get_tokenizer(lang)
+        new_func = lambda text, _lang: tokenize(text)
+        legacy = lines_per_sec(legacy_clean_tokens, lines, lang)
+        new = lines_per_sec(new_func, lines, lang)
+        # Share of lines where the Unicode-aware output equals the ASCII-only output
+        same = sum(tokenize(l) == legacy_clean_tokens(l, lang) for l in lines) / max(len(lines), 1)
+        print(f"{lang:<5} {source:<10} {legacy:>12,.0f} {new:>12,.0f} {new / legacy:>7.2f}x {same:>11.1%}")
+
+if __name__ == "__main__":
+    main()
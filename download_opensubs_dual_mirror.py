@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
-import os, sys, csv, gzip, shutil, zipfile
+import os, sys, csv, gzip, json, queue, struct, zipfile, zlib
 from pathlib import Path
 from datetime import datetime, timezone
 import urllib.request, urllib.error
 import ssl
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Try to use certifi for SSL certificates. 
 try:
@@ -28,56 +31,286 @@ TMPDIR = Path("data/_dual_tmp")
 SUMMARY = Path("data/corpus_summary.csv")
 LOG = TMPDIR / "download.log"
 
+STATS_FILE = TMPDIR / "mirror_stats.json"
+
+DOWNLOAD_WORKERS = 3    # Languages downloaded in parallel
+MAX_RETRIES = 5         # Resume attempts per URL after a dropped connection
+DOWNLOAD_BLOCK = 1024 * 1024
+COPY_BLOCK = 8 * 1024 * 1024   # Read/write block for extraction and counting
+
+# Mirror routing
+MIRRORS = [PRIMARY_BASE, FALLBACK_BASE]  # Tie-break order
+PROBE_BYTES = 256 * 1024    # Size of the racing request sent to unmeasured mirrors
+PROBE_TIMEOUT = 10          # Seconds; a dead mirror costs this once, not 60s per file
+EWMA_WEIGHT = 0.3           # Weight of the newest transfer in a mirror's average MB/s
+SLOW_CHECK_SECONDS = 30     # How often a running transfer is compared with the other mirrors
+SLOW_FACTOR = 0.25          # Abandon a transfer below this share of the best rival's MB/s
+DEAD_AFTER = 3              # Errors in a row before a mirror is tried last
+
+# Streaming mode (--stream)
+STREAM = False
+KEEP_TEXT = False       # Write {lang}.txt while streaming
+KEEP_ARCHIVE = False    # Save the raw archive while streaming
+MINE = False            # Feed the stream to the idiom miner
+PIPELINE_QUEUE = 8      # Blocks/batches buffered between stages
+MINED = {}              # lang -> miner result, filled by the streaming workers
+mining = None           # idiom_miner_dictionary, imported only for --mine
+
 for d in (OUTDIR, TMPDIR):
     d.mkdir(parents=True, exist_ok=True)
 
+_log_lock = threading.Lock()
+
 def log(msg):
     # Print with a timestamp so we know when things happen
     timestamp = datetime.now().strftime("%H:%M:%S")
     full_msg = f"[{timestamp}] {msg}"
-    print(full_msg, flush=True)
-    with open(LOG, "a", encoding="utf-8") as f:
-        f.write(full_msg + "\n")
+    with _log_lock:
+        print(full_msg, flush=True)
+        with open(LOG, "a", encoding="utf-8") as f:
+            f.write(full_msg + "\n")
+
+def _range_total(headers):
+    """Total size from a 'Content-Range: bytes a-b/TOTAL' header, if given."""
+    value = headers.get("Content-Range", "")
+    total = value.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
 
-def try_url(url, dest):
-    """Attempts to download a URL with a progress bar."""
+# --- MIRROR STATS ---
+# Per-mirror throughput and error history, shared by all download threads and
+# persisted in TMPDIR so later runs start from what earlier runs measured.
+
+_stats_lock = threading.Lock()
+_probe_lock = threading.Lock()
+MIRROR_STATS = {}
+
+def load_mirror_stats():
+    global MIRROR_STATS
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, context=SSL_CONTEXT, timeout=60) as r:
-            # Get file size if available
-            file_size = r.getheader('Content-Length')
-            file_size = int(file_size) if file_size else None
-            
-            with open(dest, "wb") as f:
-                downloaded = 0
-                block_sz = 8192 * 4
-                while True:
-                    buffer = r.read(block_sz)
-                    if not buffer:
-                        break
-                    downloaded += len(buffer)
-                    f.write(buffer)
-                    
-                    # Visual Progress Bar
-                    if file_size:
-                        percent = downloaded * 100 / file_size
-                        mb_dl = downloaded / (1024 * 1024)
-                        mb_tot = file_size / (1024 * 1024)
-                        sys.stdout.write(f"\r    Downloading: {percent:.1f}% ({mb_dl:.1f}/{mb_tot:.1f} MB)")
-                    else:
-                        mb_dl = downloaded / (1024 * 1024)
-                        sys.stdout.write(f"\r    Downloading: {mb_dl:.1f} MB (Unknown Total)")
-                    sys.stdout.flush()
-        
-        print() # Move to next line after done
-        return True, 200
+        with open(STATS_FILE, "r", encoding="utf-8") as f:
+            MIRROR_STATS = json.load(f)
+    except (OSError, ValueError):
+        MIRROR_STATS = {}
+
+def _mirror(base):
+    return MIRROR_STATS.setdefault(base, {"mbps": None, "bytes": 0, "seconds": 0.0,
+                                          "transfers": 0, "errors": 0, "consecutive_errors": 0})
+
+def _save_mirror_stats():
+    tmp = STATS_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(MIRROR_STATS, f, indent=2)
+    tmp.replace(STATS_FILE)
+
+def record_transfer(base, nbytes, seconds, label="", complete=True):
+    """
+    Folds one measured transfer into the mirror's moving-average MB/s. Only a
+    complete transfer ends the mirror's error streak: bytes that arrived before
+    a drop still count towards its speed, but a mirror that always breaks off
+    halfway must keep counting towards DEAD_AFTER.
+    """
+    if base is None or nbytes <= 0 or seconds <= 0:
+        return
+    mbps = nbytes / (1024 * 1024) / seconds
+    with _stats_lock:
+        m = _mirror(base)
+        m["mbps"] = mbps if m["mbps"] is None else EWMA_WEIGHT * mbps + (1 - EWMA_WEIGHT) * m["mbps"]
+        m["bytes"] += nbytes
+        m["seconds"] += seconds
+        m["transfers"] += 1
+        if complete:
+            m["consecutive_errors"] = 0
+        avg = m["mbps"]
+        _save_mirror_stats()
+    log(f"    {label}{base}: {nbytes / (1024 * 1024):.1f} MB in {seconds:.1f}s = {mbps:.2f} MB/s (avg {avg:.2f} MB/s)")
+
+def record_error(base, label=""):
+    if base is None:
+        return
+    with _stats_lock:
+        m = _mirror(base)
+        m["errors"] += 1
+        m["consecutive_errors"] += 1
+        _save_mirror_stats()
+    log(f"    {label}{base}: error #{m['errors']} ({m['consecutive_errors']} in a row)")
+
+def best_rival_mbps(base, rivals):
+    """Best average MB/s among the healthy mirrors in `rivals`, if any was measured."""
+    with _stats_lock:
+        rates = [m["mbps"] for b, m in MIRROR_STATS.items()
+                 if b != base and b in rivals and m["mbps"] and m["consecutive_errors"] < DEAD_AFTER]
+    return max(rates, default=None)
+
+def should_switch(base, rivals):
+    """True once `base` has failed DEAD_AFTER times in a row and one of `rivals` works."""
+    return (base is not None and best_rival_mbps(base, rivals) is not None
+            and _mirror(base)["consecutive_errors"] >= DEAD_AFTER)
+
+def untried(ranked, i):
+    """
+    Mirrors after position i of a file's ranked list that were not tried for
+    it yet: the ones try_url may hand the .part over to. A mirror left for
+    being slow is appended to the list again, and then has no rivals, so it
+    resumes its .part instead of being given up once the others failed.
+    """
+    return [b for b in ranked[i + 1:] if b not in ranked[:i + 1]]
+
+def probe_mirror(base, rel):
+    """Times a small Range request against one mirror; returns MB/s or None."""
+    req = urllib.request.Request(f"{base}{rel}", headers={"User-Agent": "Mozilla/5.0",
+                                                         "Range": f"bytes=0-{PROBE_BYTES - 1}"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, context=SSL_CONTEXT, timeout=PROBE_TIMEOUT) as r:
+            nbytes = len(r.read(PROBE_BYTES))
     except urllib.error.HTTPError as e:
-        sys.stdout.write("\r") # clear line
-        return False, e.code
-    except Exception as e:
-        sys.stdout.write("\r") # clear line
-        log(f"    Error {e} for {url}")
-        return False, None
+        if e.code >= 500:
+            record_error(base, "probe ")
+        return None  # 404 etc: the mirror answers, it just lacks this file
+    except Exception:
+        record_error(base, "probe ")
+        return None
+    seconds = time.perf_counter() - t0
+    record_transfer(base, nbytes, seconds, "probe ")
+    return nbytes / (1024 * 1024) / seconds
+
+def rank_mirrors(rel, label=""):
+    """
+    Orders MIRRORS for one file: mirrors never measured are first raced with
+    small probe requests, then healthy mirrors go fastest first and mirrors
+    with DEAD_AFTER errors in a row go last. Ties keep PRIMARY/FALLBACK order.
+    """
+    # One thread races the probes; the others wait and reuse the result
+    with _probe_lock:
+        with _stats_lock:
+            unmeasured = [b for b in MIRRORS
+                          if _mirror(b)["mbps"] is None and _mirror(b)["consecutive_errors"] < DEAD_AFTER]
+        if unmeasured:
+            with ThreadPoolExecutor(max_workers=len(unmeasured)) as pool:
+                list(pool.map(lambda b: probe_mirror(b, rel), unmeasured))
+
+    with _stats_lock:
+        def score(item):
+            pos, base = item
+            m = _mirror(base)
+            return (m["consecutive_errors"] >= DEAD_AFTER, -(m["mbps"] or 0), pos)
+        ranked = [b for _, b in sorted(enumerate(MIRRORS), key=score)]
+        summary = ", ".join(
+            f"{b} ({MIRROR_STATS[b]['mbps'] or 0:.2f} MB/s, {MIRROR_STATS[b]['consecutive_errors']} errors)" for b in ranked)
+    log(f"{label}Mirror order: {summary}")
+    return ranked
+
+def try_url(url, dest, label="", mirror=None, rivals=()):
+    """
+    Downloads a URL with a progress bar. Data goes to dest + ".part" and is
+    renamed to dest only once it is complete (checked against Content-Length).
+    A dropped connection, or a .part left by an earlier run, is resumed with an
+    HTTP Range request instead of starting again from byte 0.
+    Throughput and errors are recorded against `mirror`; a transfer much slower
+    than the average of one of `rivals` (mirrors not yet tried for this file,
+    see untried) is abandoned (returns code "slow") so the caller can resume
+    the .part from that mirror.
+    """
+    part = dest.with_name(dest.name + ".part")
+    for attempt in range(1, MAX_RETRIES + 1):
+        have = part.stat().st_size if part.exists() else 0
+        headers = {"User-Agent": "Mozilla/5.0"}
+        if have:
+            headers["Range"] = f"bytes={have}-"
+        t0 = time.perf_counter()
+        received = 0
+        try:
+            req = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(req, context=SSL_CONTEXT, timeout=60) as r:
+                # Get file size if available
+                length = r.getheader('Content-Length')
+                length = int(length) if length else None
+                if have and r.status == 206:
+                    file_size = _range_total(r.headers) or (have + length if length is not None else None)
+                    mode = "ab"
+                    log(f"    {label}Resuming at {have / (1024 * 1024):.1f} MB")
+                else:
+                    # Server ignored the Range header: start over
+                    have = 0
+                    file_size = length
+                    mode = "wb"
+                
+                with open(part, mode) as f:
+                    downloaded = have
+                    next_report = 0
+                    next_check = t0 + SLOW_CHECK_SECONDS
+                    while True:
+                        buffer = r.read(DOWNLOAD_BLOCK)
+                        if not buffer:
+                            break
+                        downloaded += len(buffer)
+                        received += len(buffer)
+                        f.write(buffer)
+                        
+                        now = time.perf_counter()
+                        if mirror is not None and now >= next_check:
+                            next_check = now + SLOW_CHECK_SECONDS
+                            rate = received / (1024 * 1024) / (now - t0)
+                            rival = best_rival_mbps(mirror, rivals)
+                            if rival and rate < rival * SLOW_FACTOR:
+                                log(f"    {label}{rate:.2f} MB/s here vs {rival:.2f} MB/s elsewhere: switching mirror")
+                                record_transfer(mirror, received, now - t0, label, complete=False)
+                                return False, "slow"
+                        
+                        # Visual Progress Bar (one line per 10% when several downloads run at once)
+                        mb_dl = downloaded / (1024 * 1024)
+                        if file_size:
+                            percent = downloaded * 100 / file_size
+                            mb_tot = file_size / (1024 * 1024)
+                            status = f"Downloading: {percent:.1f}% ({mb_dl:.1f}/{mb_tot:.1f} MB)"
+                        else:
+                            percent = None
+                            status = f"Downloading: {mb_dl:.1f} MB (Unknown Total)"
+                        if DOWNLOAD_WORKERS == 1:
+                            sys.stdout.write(f"\r    {status}")
+                            sys.stdout.flush()
+                        elif percent is not None and percent >= next_report:
+                            print(f"    {label}{status}", flush=True)
+                            next_report = percent - percent % 10 + 10
+            
+            if DOWNLOAD_WORKERS == 1:
+                print() # Move to next line after done
+            size = part.stat().st_size
+            complete = file_size is None or size == file_size
+            record_transfer(mirror, received, time.perf_counter() - t0, label, complete)
+            if not complete:
+                log(f"    {label}Connection dropped at {size}/{file_size} bytes (attempt {attempt}/{MAX_RETRIES})")
+                record_error(mirror, label)
+                if should_switch(mirror, rivals):
+                    # Another mirror works: resume the .part there instead of retrying here
+                    return False, None
+                continue
+            part.replace(dest)
+            return True, 200
+        except urllib.error.HTTPError as e:
+            sys.stdout.write("\r") # clear line
+            if e.code == 416 and have:
+                # Nothing left to send: the .part is either complete or bogus
+                if _range_total(e.headers) == have:
+                    part.replace(dest)
+                    return True, 200
+                part.unlink()
+                continue
+            if e.code >= 500:
+                record_error(mirror, label)
+            return False, e.code
+        except Exception as e:
+            sys.stdout.write("\r") # clear line
+            log(f"    {label}Error {e} for {url} (attempt {attempt}/{MAX_RETRIES})")
+            record_error(mirror, label)
+            if received:
+                record_transfer(mirror, received, time.perf_counter() - t0, label, complete=False)
+            if should_switch(mirror, rivals):
+                # Another mirror works: resume the .part there instead of retrying here
+                return False, None
+            if attempt < MAX_RETRIES:
+                time.sleep(min(2 ** attempt, 30))
+    return False, None
 
 def get_moses_config(lang):
     if lang == "en":
@@ -88,6 +321,104 @@ def get_moses_config(lang):
     target_col = pair.index(lang)
     return pair_str, target_col
 
+# --- CORPUS TEXT + STATS ---
+
+def stats_path(txt_path):
+    """Sidecar with the line/token/byte counts of a {lang}.txt ({lang}.stats.json)."""
+    return txt_path.with_suffix(".stats.json")
+
+def read_stats(txt_path):
+    """Sidecar stats of a text file, or None if missing or written for another version of it."""
+    try:
+        with open(stats_path(txt_path), "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    st = txt_path.stat()
+    return stats if stats.get("fingerprint") == f"{st.st_size}:{st.st_mtime_ns}" else None
+
+def write_stats(txt_path, lines, tokens):
+    st = txt_path.stat()
+    with open(stats_path(txt_path), "w", encoding="utf-8") as f:
+        json.dump({"lines": lines, "tokens_approx": tokens, "bytes": st.st_size,
+                   "fingerprint": f"{st.st_size}:{st.st_mtime_ns}"}, f)
+
+class CorpusWriter:
+    """
+    Writes a {lang}.txt in large blocks and counts it on the way, so no
+    separate pass is needed afterwards. Lines are counted as the text-mode
+    reads of count() and the miner see them (universal newlines, an
+    unterminated last line counts if it decodes to anything); tokens are
+    whitespace-separated words. On close the counts go to the sidecar file.
+    With path=None it only counts.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.f = open(path, "wb") if path else None
+        self.tail = b""
+        self.lines = self.tokens = self.bytes = self.chars = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(save=exc_type is None)
+
+    def _count(self, text, final=False):
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        self.lines += text.count("\n")
+        if final and text and not text.endswith("\n"):
+            self.lines += 1
+        self.tokens += len(text.split())
+        self.chars += len(text)
+
+    def write(self, data):
+        """Raw bytes, any alignment (written unchanged)."""
+        if self.f:
+            self.f.write(data)
+        self.bytes += len(data)
+        data = self.tail + data
+        cut = data.rfind(b"\n") + 1
+        self.tail = data[cut:]
+        if cut:
+            # Newline-aligned, so no UTF-8 sequence is cut in half
+            self._count(data[:cut].decode("utf-8", errors="ignore"))
+
+    def write_lines(self, lines):
+        """Whole lines without their newlines."""
+        if not lines:
+            return
+        text = "\n".join(lines) + "\n"
+        self._count(text)
+        if self.f:
+            data = text.encode("utf-8")
+            self.f.write(data)
+            self.bytes += len(data)
+
+    def close(self, save=True):
+        if self.tail:
+            self._count(self.tail.decode("utf-8", errors="ignore"), final=True)
+            self.tail = b""
+        if not self.f:
+            return
+        self.f.close()
+        self.f = None
+        if save:
+            write_stats(self.path, self.lines, self.tokens)
+
+def extract_column(text, target_col):
+    """Target side of each "src ||| tgt" line in a block of decoded Moses text."""
+    out = []
+    for line in text.split("\n"):
+        parts = line.strip().split(" ||| ")
+        if len(parts) >= 2:
+            col = parts[target_col].strip()
+            if col:
+                out.append(col)
+    return out
+
 def extract_from_moses_zip(zip_path, out_txt, target_col):
     kept = 0
     try:
@@ -96,107 +427,309 @@ def extract_from_moses_zip(zip_path, out_txt, target_col):
             if not members:
                 return 0
             
-            print(f"    Extracting text from zip...", flush=True)
-            with zf.open(members[0], "r") as fin, open(out_txt, "w", encoding="utf-8") as fout:
-                for raw in fin:
-                    try:
-                        line = raw.decode("utf-8", errors="ignore").strip()
-                        parts = line.split(" ||| ")
-                        if len(parts) >= 2:
-                            text = parts[target_col].strip()
-                            if text:
-                                fout.write(text + "\n")
-                                kept += 1
-                    except Exception:
-                        continue
+            print(f"    Extracting {zip_path.name}...", flush=True)
+            # Block reads, one decode and one write per block; stats come from the writer
+            with zf.open(members[0], "r") as fin, CorpusWriter(out_txt) as fout:
+                tail = b""
+                for block in iter(lambda: fin.read(COPY_BLOCK), b""):
+                    data = tail + block
+                    cut = data.rfind(b"\n") + 1
+                    tail = data[cut:]
+                    texts = extract_column(data[:cut].decode("utf-8", errors="ignore"), target_col)
+                    fout.write_lines(texts)
+                    kept += len(texts)
+                texts = extract_column(tail.decode("utf-8", errors="ignore"), target_col)
+                fout.write_lines(texts)
+                kept += len(texts)
     except Exception as e:
         log(f"    Zip extraction error: {e}")
         return 0
     return kept
 
+def gunzip_text(gz_path, out_txt):
+    """Decompresses a mono .gz into out_txt, counting it on the way."""
+    with gzip.open(gz_path, "rb") as f_in, CorpusWriter(out_txt) as f_out:
+        for block in iter(lambda: f_in.read(COPY_BLOCK), b""):
+            f_out.write(block)
+
 def count(path):
-    lines = toks = 0
+    """Lines and approximate tokens of a text file (for files without a stats sidecar)."""
     if not path.exists(): return 0, 0
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for ln in f:
-            lines += 1
-            toks += len(ln.split())
-    return lines, toks
+    counter = CorpusWriter()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            counter.write(block)
+    counter.close()
+    return counter.lines, counter.tokens
 
-def main():
-    rows = []
-    
-    for lang in LANGS:
-        outdir = OUTDIR / lang
-        outdir.mkdir(parents=True, exist_ok=True)
-        out_txt = outdir / f"{lang}.txt"
-        
-        if out_txt.exists() and out_txt.stat().st_size > 100000:
-            print(f"Skipping {lang}, already exists.")
+# --- STREAMING PIPELINE ---
+# network -> inflate + extract -> count / write / mine, as three stages joined
+# by bounded queues so download, decompression and CPU work overlap and no
+# archive has to sit on disk. Only what --keep-text / --keep-archive ask for is written.
+
+_DONE = object()
+
+def _put(q, item, stop):
+    """Queue put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
             continue
+    return False
 
-        ok = False
-        used_version = ""
-        used_mode = ""
+def _drain(q, stop):
+    """Yields queue items until the end marker (or until the pipeline stops)."""
+    while True:
+        try:
+            item = q.get(timeout=0.5)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        yield item
 
-        # STRATEGY 1: Try Moses Pair
-        pair_str, target_col = get_moses_config(lang)
-        
-        for ver in VERSIONS:
-            rel = f"/{ver}/moses/{pair_str}.txt.zip"
-            urls = [
-                f"{PRIMARY_BASE}{rel}",
-                f"{FALLBACK_BASE}{rel}"
-            ]
-            
-            for url in urls:
-                tmp_zip = TMPDIR / f"{pair_str}.{ver}.zip"
-                log(f"Trying MOSES {url} (extract col {target_col})")
-                
-                success, code = try_url(url, tmp_zip)
-                if success:
-                    kept = extract_from_moses_zip(tmp_zip, out_txt, target_col)
-                    if kept > 1000:
-                        ok = True
-                        used_version = ver
-                        used_mode = f"moses({pair_str})"
-                        tmp_zip.unlink() 
-                        break
-                    else:
-                        log("    Extraction resulted in empty or small file.")
-            if ok: break
+def _gunzip_chunks(blocks):
+    """Inflates a (possibly multi-member) gzip stream block by block."""
+    d = zlib.decompressobj(31)
+    started = False
+    for block in blocks:
+        while block:
+            started = True
+            yield d.decompress(block)
+            if d.eof:
+                block = d.unused_data
+                d = zlib.decompressobj(31)
+                started = False
+            else:
+                block = b""
+    if started:
+        raise ValueError("truncated gzip stream")
+
+def _zip_member_chunks(blocks, lang):
+    """
+    Reads a zip archive front to back through its local file headers (the
+    central directory is never needed) and yields the inflated data of the
+    first member with the language's text: a *.txt Moses file ("moses") or a
+    *.{lang} monolingual side ("plain"). Members before it are inflated and
+    dropped, since the stream has to pass through them anyway.
+    """
+    it = iter(blocks)
+    buf = bytearray()
+
+    def need(n):
+        while len(buf) < n:
+            block = next(it, None)
+            if block is None:
+                return False
+            buf.extend(block)
+        return True
+
+    while need(30) and buf[:4] == b"PK\x03\x04":
+        flags, method = struct.unpack_from("<HH", buf, 6)
+        csize = struct.unpack_from("<I", buf, 18)[0]
+        name_len, extra_len = struct.unpack_from("<HH", buf, 26)
+        if not need(30 + name_len + extra_len):
+            raise ValueError("truncated zip header")
+        name = bytes(buf[30:30 + name_len]).decode("utf-8", errors="replace")
+        del buf[:30 + name_len + extra_len]
+        kind = "plain" if name.endswith(f".{lang}") else "moses" if name.endswith(".txt") else None
+
+        if method == 0 and not flags & 8:
+            # Stored with a known size
+            while csize:
+                if not buf and not need(1):
+                    raise ValueError("truncated zip member")
+                take = bytes(buf[:csize])
+                del buf[:len(take)]
+                csize -= len(take)
+                if kind:
+                    yield kind, take
+        elif method == 8:
+            # Deflate streams mark their own end, so sizes are not needed
+            d = zlib.decompressobj(-15)
+            while not d.eof:
+                if not buf and not need(1):
+                    raise ValueError("truncated zip member")
+                out = d.decompress(bytes(buf))
+                buf.clear()
+                if kind and out:
+                    yield kind, out
+            buf[:0] = d.unused_data
+        else:
+            raise ValueError(f"cannot stream zip member {name} (method {method})")
+
+        if kind:
+            log(f"    Streamed member {name}")
+            return
+        if flags & 8:
+            # Data descriptor: optional signature, CRC, then 32- or 64-bit sizes
+            need(28)
+            if buf[:4] == b"PK\x07\x08":
+                del buf[:4]
+            next_header = 12 if buf[12:14] == b"PK" else 20
+            del buf[:next_header]
+
+def _split_lines(chunks, mode, target_col):
+    """Turns inflated chunks into batches of extracted text lines."""
+    tail = b""
+    for kind, chunk in chunks:
+        if mode == "zip":
+            mode = kind
+        data = tail + chunk
+        cut = data.rfind(b"\n") + 1
+        tail = data[cut:]
+        if cut:
+            yield _extract(data[:cut].decode("utf-8", errors="ignore"), mode, target_col)
+    if tail:
+        yield _extract(tail.decode("utf-8", errors="ignore") + "\n", mode, target_col)
+
+def _extract(text, mode, target_col):
+    """Lines of a newline-terminated block of text: the target column for Moses, else as is."""
+    if mode == "moses":
+        # Same rules as extract_from_moses_zip
+        return extract_column(text, target_col)
+    return text.split("\n")[:-1] if text != "\n" else []
+
+def stream_url(url, lang, kind, target_col, archive_path=None, out_txt=None, miner=None, label="", mirror=None):
+    """
+    Runs the streaming pipeline for one URL (kind is "zip" or "gz").
+    Returns (lines, tokens, characters of text); raises if any stage fails.
+    """
+    stop = threading.Event()
+    abort = threading.Event()  # The consumer failed: nobody reads line_q any more
+    errors = []
+    raw_q = queue.Queue(maxsize=PIPELINE_QUEUE)
+    line_q = queue.Queue(maxsize=PIPELINE_QUEUE)
+
+    def fetch():
+        t0 = time.perf_counter()
+        received = 0
+        try:
+            req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+            with urllib.request.urlopen(req, context=SSL_CONTEXT, timeout=60) as r:
+                archive = open(archive_path, "wb") if archive_path else None
+                try:
+                    while not stop.is_set():
+                        block = r.read(DOWNLOAD_BLOCK)
+                        if not block:
+                            break
+                        received += len(block)
+                        if archive:
+                            archive.write(block)
+                        if not _put(raw_q, block, stop):
+                            break
+                finally:
+                    if archive:
+                        archive.close()
+            record_transfer(mirror, received, time.perf_counter() - t0, label)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(raw_q, _DONE, stop)
+
+    def inflate():
+        try:
+            blocks = _drain(raw_q, stop)
+            chunks = _zip_member_chunks(blocks, lang) if kind == "zip" else (("plain", c) for c in _gunzip_chunks(blocks))
+            for batch in _split_lines(chunks, kind, target_col):
+                if not _put(line_q, batch, abort):
+                    return
+            if archive_path:
+                # The text is done but the archive copy should be complete
+                for _ in blocks:
+                    pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # Lets the fetcher stop early once the wanted member has been read
+            stop.set()
+            _put(line_q, _DONE, abort)
+
+    stages = [threading.Thread(target=fetch, daemon=True), threading.Thread(target=inflate, daemon=True)]
+    for t in stages:
+        t.start()
+
+    fout = CorpusWriter(out_txt)
+    try:
+        # The inflate stage sends _DONE unless aborted, so this never waits forever
+        for batch in _drain(line_q, abort):
+            fout.write_lines(batch)
+            if miner:
+                miner.feed(batch)
+    finally:
+        # If this loop failed, the inflate stage may be waiting on a full line_q
+        abort.set()
+        stop.set()
+        for t in stages:
+            t.join()
+        fout.close(save=not errors)
+    if errors:
+        raise errors[0]
+    return fout.lines, fout.tokens, fout.chars
+
+def stream_language(lang):
+    """Streaming counterpart of the download + extract + count steps of fetch_language."""
+    label = f"[{lang}] "
+    out_txt = OUTDIR / lang / f"{lang}.txt" if KEEP_TEXT else None
+    pair_str, target_col = get_moses_config(lang)
+    jobs = [(f"/{ver}/moses/{pair_str}.txt.zip", "zip", f"moses({pair_str})", ver, 1000) for ver in VERSIONS]
+    if lang != "en":
+        jobs += [(f"/{ver}/mono/OpenSubtitles.raw.{lang}.gz", "gz", "mono", ver, 1) for ver in VERSIONS]
+
+    for rel, kind, mode, ver, min_lines in jobs:
+        for base in rank_mirrors(rel, label):
+            url = f"{base}{rel}"
+            log(f"{label}Streaming {url} (extract col {target_col})")
+            archive = TMPDIR / f"{lang}.{ver}.{kind}" if KEEP_ARCHIVE else None
+            miner = mining.LineMiner(lang) if MINE else None
+            try:
+                lines, toks, chars = stream_url(url, lang, kind, target_col, archive, out_txt, miner, label, base)
+                if lines > min_lines and chars > 1000:
+                    if miner:
+                        MINED[lang] = miner.result()
+                    return lines, toks, mode, ver
+                log(f"    {label}Extraction resulted in empty or small file.")
+            except urllib.error.HTTPError as e:
+                if e.code >= 500:
+                    record_error(base, label)
+            except Exception as e:
+                log(f"    {label}Stream failed: {e}")
+                record_error(base, label)
+            # Never leave a partial file that a later run would take as finished
+            for path in (out_txt, archive, out_txt and stats_path(out_txt)):
+                if path:
+                    path.unlink(missing_ok=True)
+    return None
 
-        # STRATEGY 2: Mono (Fallback)
-        if not ok and lang != "en":
-            for ver in VERSIONS:
-                rel = f"/{ver}/mono/OpenSubtitles.raw.{lang}.gz"
-                urls = [
-                    f"{PRIMARY_BASE}{rel}",
-                    f"{FALLBACK_BASE}{rel}"
-                ]
-                for url in urls:
-                    tmp_gz = TMPDIR / f"{lang}.{ver}.gz"
-                    log(f"Trying MONO {url}")
-                    success, code = try_url(url, tmp_gz)
-                    if success:
-                        try:
-                            print(f"    Unzipping...", flush=True)
-                            with gzip.open(tmp_gz, "rb") as f_in, open(out_txt, "wb") as f_out:
-                                shutil.copyfileobj(f_in, f_out)
-                            if out_txt.stat().st_size > 1000:
-                                ok = True
-                                used_version = ver
-                                used_mode = "mono"
-                                break
-                        except Exception as e:
-                            log(f"    Gunzip failed: {e}")
-                if ok: break
-
-        # REPORTING
-        if ok:
-            lines, toks = count(out_txt)
-            log(f"[OK] {lang}: {lines} lines ({used_mode} @ {used_version})")
-            rows.append({
+def fetch_language(lang):
+    """Downloads and extracts one language. Returns its summary row, or None if skipped."""
+    label = f"[{lang}] "
+    outdir = OUTDIR / lang
+    outdir.mkdir(parents=True, exist_ok=True)
+    out_txt = outdir / f"{lang}.txt"
+    
+    if out_txt.exists() and out_txt.stat().st_size > 100000:
+        print(f"Skipping {lang}, already exists.")
+        if read_stats(out_txt) is None:
+            # One-off pass so the miner can rely on the sidecar
+            write_stats(out_txt, *count(out_txt))
+        return None
+
+    ok = False
+    used_version = ""
+    used_mode = ""
+
+    if STREAM:
+        streamed = stream_language(lang)
+        if streamed:
+            lines, toks, used_mode, used_version = streamed
+            log(f"[OK] {lang}: {lines} lines ({used_mode} @ {used_version}, streamed)")
+            return {
                 "language": lang,
                 "lines": lines,
                 "tokens_approx": toks,
@@ -204,18 +737,145 @@ def main():
                 "release_used": used_version,
                 "pair_used": used_mode,
                 "downloaded_at": datetime.now(timezone.utc).isoformat()
-            })
-        else:
-            log(f"[FAIL] {lang} - Could not find valid data on any mirror.")
-            rows.append({
-                "language": lang,
-                "lines": 0,
-                "tokens_approx": 0,
-                "corpus": "OpenSubtitles",
-                "release_used": "FAILED",
-                "pair_used": "FAILED",
-                "downloaded_at": datetime.now(timezone.utc).isoformat()
-            })
+            }
+
+    # STRATEGY 1: Try Moses Pair
+    pair_str, target_col = get_moses_config(lang)
+    
+    for ver in ([] if STREAM else VERSIONS):
+        rel = f"/{ver}/moses/{pair_str}.txt.zip"
+        
+        ranked = rank_mirrors(rel, label)
+        for i, base in enumerate(ranked):
+            url = f"{base}{rel}"
+            # Languages share the English side, so keep each language's zip separate
+            tmp_zip = TMPDIR / f"{pair_str}.{ver}.{lang}.zip"
+            log(f"{label}Trying MOSES {url} (extract col {target_col})")
+            
+            success, code = try_url(url, tmp_zip, label, base, untried(ranked, i))
+            if code == "slow":
+                ranked.append(base)
+            if success:
+                kept = extract_from_moses_zip(tmp_zip, out_txt, target_col)
+                if kept > 1000:
+                    ok = True
+                    used_version = ver
+                    used_mode = f"moses({pair_str})"
+                    tmp_zip.unlink() 
+                    break
+                else:
+                    log(f"    {label}Extraction resulted in empty or small file.")
+        if ok: break
+
+    # STRATEGY 2: Mono (Fallback)
+    if not ok and lang != "en" and not STREAM:
+        for ver in VERSIONS:
+            rel = f"/{ver}/mono/OpenSubtitles.raw.{lang}.gz"
+            ranked = rank_mirrors(rel, label)
+            for i, base in enumerate(ranked):
+                url = f"{base}{rel}"
+                tmp_gz = TMPDIR / f"{lang}.{ver}.gz"
+                log(f"{label}Trying MONO {url}")
+                success, code = try_url(url, tmp_gz, label, base, untried(ranked, i))
+                if code == "slow":
+                    ranked.append(base)
+                if success:
+                    try:
+                        print(f"    {label}Unzipping...", flush=True)
+                        gunzip_text(tmp_gz, out_txt)
+                        if out_txt.stat().st_size > 1000:
+                            ok = True
+                            used_version = ver
+                            used_mode = "mono"
+                            break
+                    except Exception as e:
+                        log(f"    {label}Gunzip failed: {e}")
+            if ok: break
+
+    # REPORTING
+    if ok:
+        # Counted while extracting; count() only if the sidecar is somehow missing
+        stats = read_stats(out_txt)
+        lines, toks = (stats["lines"], stats["tokens_approx"]) if stats else count(out_txt)
+        log(f"[OK] {lang}: {lines} lines ({used_mode} @ {used_version})")
+        return {
+            "language": lang,
+            "lines": lines,
+            "tokens_approx": toks,
+            "corpus": "OpenSubtitles",
+            "release_used": used_version,
+            "pair_used": used_mode,
+            "downloaded_at": datetime.now(timezone.utc).isoformat()
+        }
+    log(f"[FAIL] {lang} - Could not find valid data on any mirror.")
+    return {
+        "language": lang,
+        "lines": 0,
+        "tokens_approx": 0,
+        "corpus": "OpenSubtitles",
+        "release_used": "FAILED",
+        "pair_used": "FAILED",
+        "downloaded_at": datetime.now(timezone.utc).isoformat()
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download OpenSubtitles text per language from the OPUS mirrors.")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS,
+                        help=f"languages downloaded at the same time (default {DOWNLOAD_WORKERS})")
+    parser.add_argument("--primary", default=PRIMARY_BASE, help="primary mirror base URL")
+    parser.add_argument("--fallback", default=FALLBACK_BASE, help="fallback mirror base URL")
+    parser.add_argument("--stream", action="store_true",
+                        help="download, extract and count in one streaming pass, without temporary archives")
+    parser.add_argument("--keep-text", action="store_true",
+                        help="with --stream: also write {lang}.txt")
+    parser.add_argument("--keep-archive", action="store_true",
+                        help="with --stream: also save the downloaded archive in TMPDIR")
+    parser.add_argument("--mine", action="store_true",
+                        help="with --stream: run the idiom miner on the stream and write its CSV and report")
+    return parser.parse_args()
+
+def write_mined_results():
+    """
+    Writes the idiom study for --mine. Languages that were skipped because
+    their text was already there are mined from their text files, so the
+    study covers the same languages as a miner run. If a language in LANGS
+    has no corpus at all (its stream failed on every mirror), the study would
+    be partial: it is not written, leaving earlier results alone.
+    """
+    results, missing = [], []
+    # Same language order as a miner run over the text files
+    for lang in mining.IDIOMS:
+        res = MINED.get(lang) or mining.process_language(lang)
+        if res:
+            results.append(res)
+        elif lang in LANGS:
+            missing.append(lang)
+    if missing:
+        print(f"Not writing the idiom study: no corpus for {', '.join(missing)}. "
+              f"Re-run once they download, or mine the text files with idiom_miner_dictionary.py.")
+        return
+    mining.write_results(results)
+
+def main():
+    global DOWNLOAD_WORKERS, PRIMARY_BASE, FALLBACK_BASE, MIRRORS
+    global STREAM, KEEP_TEXT, KEEP_ARCHIVE, MINE, mining
+    args = parse_args()
+    DOWNLOAD_WORKERS = max(1, args.workers)
+    PRIMARY_BASE, FALLBACK_BASE = args.primary, args.fallback
+    MIRRORS = [PRIMARY_BASE, FALLBACK_BASE]
+    STREAM, KEEP_TEXT, KEEP_ARCHIVE, MINE = args.stream, args.keep_text, args.keep_archive, args.mine
+    if MINE:
+        if not STREAM:
+            sys.exit("--mine needs --stream (otherwise run idiom_miner_dictionary.py on the text files)")
+        import idiom_miner_dictionary as mining
+    load_mirror_stats()
+    
+    # Results come back in LANGS order whatever order the downloads finish in
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        rows = [row for row in pool.map(fetch_language, LANGS) if row]
+
+    if MINE:
+        write_mined_results()
 
     # Write Summary
     SUMMARY.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Persistent inverted token index for the idiom miner.
+
+    python idiom_index.py build [lang ...]   # tokenize each corpus once (slow, one-off)
+    python idiom_index.py query [lang ...]   # re-run the study from the index (seconds)
+
+The index lives next to the corpus as {lang}.idx.sqlite and maps every token
+(stopwords included, so STOPWORDS can change without a rebuild) to the ids of
+the lines containing it. Postings are stored in blocks as zlib-compressed
+delta arrays. A query resolves each anchor to the sorted vocabulary range that
+starts with it and merges those postings into the anchor's sorted line ids.
+An idiom's anchor lists are then merged, and the lines that appear in enough
+of them for the same THRESHOLD_RATIO as the scanning miner are counted, so
+the counts are identical. With NumPy the merges are array sorts; without it,
+set operations and a Counter.
+"""
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from collections import Counter
+from itertools import accumulate, chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from idiom_miner_dictionary import (
+    IDIOMS, STOPWORDS, BASE_DIR, CorpusReader, corpus_fingerprint, get_tokenizer, prepare_idioms,
+    write_results,
+)
+
+# Config
+INDEX_VERSION = "2"          # 2: line ids are real line numbers (1 gave a block's lines one id)
+FLUSH_POSTINGS = 20_000_000  # Postings held in memory before a block is written
+PREFIX_END = "\U0010ffff"    # Sorts after any token character (tokens never contain astral chars)
+
+def index_path(lang):
+    return BASE_DIR / lang / f"{lang}.idx.sqlite"
+
+def encode_postings(line_ids):
+    """Sorted line ids -> (first id, compressed deltas)."""
+    deltas = array("I", (b - a for a, b in zip(line_ids, line_ids[1:])))
+    return line_ids[0], zlib.compress(deltas.tobytes(), 1)
+
+def decode_postings(first, blob):
+    """Sorted line ids of one postings block: a NumPy array, or a list without NumPy."""
+    raw = zlib.decompress(blob)
+    if np is not None:
+        ids = np.empty(len(raw) // 4 + 1, dtype=np.uint32)
+        ids[0] = first
+        ids[1:] = np.frombuffer(raw, dtype=np.uint32)
+        return np.cumsum(ids, out=ids)
+    deltas = array("I")
+    deltas.frombytes(raw)
+    return list(accumulate(deltas, initial=first))
+
+def _flush(db, postings):
+    db.executemany(
+        "INSERT INTO postings (token, first, data) VALUES (?, ?, ?)",
+        ((token, *encode_postings(ids)) for token, ids in postings.items()),
+    )
+    db.commit()
+    postings.clear()
+
+def build_index(lang):
+    file_path = BASE_DIR / lang / f"{lang}.txt"
+    if not file_path.exists():
+        print(f"Skipping {lang} (File not found)")
+        return
+    out = index_path(lang)
+    tmp = out.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    print(f"Indexing {lang.upper()} -> {out}")
+    t0 = time.perf_counter()
+    db = sqlite3.connect(tmp)
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    db.execute("CREATE TABLE postings (token TEXT, first INTEGER, data BLOB)")
+
+    tokenize = get_tokenizer(lang, stopwords=False)
+    reader = CorpusReader(file_path)
+    postings = {}
+    pending = 0
+    # reader.lines jumps a whole block at a time; with_positions numbers each line
+    for line, line_no, _ in reader.with_positions():
+        tokens = set(tokenize(line))
+        if not tokens:
+            continue
+        line_id = line_no - 1
+        for token in tokens:
+            ids = postings.get(token)
+            if ids is None:
+                postings[token] = ids = array("I")
+            ids.append(line_id)
+        pending += len(tokens)
+        if pending >= FLUSH_POSTINGS:
+            _flush(db, postings)
+            pending = 0
+            print(f"  -> {reader.lines:,} lines...")
+    _flush(db, postings)
+
+    db.execute("CREATE INDEX postings_token ON postings (token)")
+    db.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", INDEX_VERSION),
+        ("lines", str(reader.lines)),
+        ("corpus", corpus_fingerprint(file_path)),
+    ])
+    db.commit()
+    db.close()
+    tmp.replace(out)
+    print(f"  {reader.lines:,} lines indexed in {time.perf_counter() - t0:.1f}s "
+          f"({out.stat().st_size / (1024 * 1024):,.1f} MB)")
+
+def open_index(lang):
+    """Opens a language index, or returns None if it is missing or stale."""
+    path = index_path(lang)
+    if not path.exists():
+        print(f"Skipping {lang} (no index, run: idiom_index.py build {lang})")
+        return None
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    meta = dict(db.execute("SELECT key, value FROM meta"))
+    file_path = BASE_DIR / lang / f"{lang}.txt"
+    if meta.get("version") != INDEX_VERSION:
+        print(f"Skipping {lang} (index format {meta.get('version')}, expected {INDEX_VERSION}; rebuild it)")
+        db.close()
+        return None
+    if file_path.exists() and meta.get("corpus") != corpus_fingerprint(file_path):
+        print(f"Skipping {lang} (corpus changed since the index was built; rebuild it)")
+        db.close()
+        return None
+    return db, int(meta["lines"])
+
+def anchor_lines(db, anchor, stops):
+    """Ids (each once, sorted with NumPy) of all lines with a non-stopword token starting with `anchor`."""
+    rows = db.execute(
+        "SELECT token, first, data FROM postings WHERE token >= ? AND token < ?",
+        (anchor, anchor + PREFIX_END),
+    )
+    postings = [decode_postings(first, data) for token, first, data in rows if token not in stops]
+    if np is not None:
+        if len(postings) == 1:
+            return postings[0]
+        # A line with several tokens under the anchor is one hit
+        ids, _ = merge_runs(postings)
+        return ids
+    return postings[0] if len(postings) == 1 else set().union(*postings)
+
+def merge_runs(arrays):
+    """
+    Merges id arrays into (distinct ids, sorted; how many arrays hold each).
+    One sort of the concatenation is several times faster than np.unique.
+    """
+    ids = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.uint32)
+    ids.sort()
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    return ids[starts], np.diff(starts, append=len(ids))
+
+def count_matches(anchor_ids, needed):
+    """Lines found in at least `needed` of the line id lists (one list per anchor occurrence)."""
+    if needed == 1 and len(anchor_ids) == 1:
+        return len(anchor_ids[0])
+    if np is not None:
+        if needed == len(anchor_ids):
+            # Every anchor is required: intersect, smallest list first
+            ids = None
+            for other in sorted(anchor_ids, key=len):
+                ids = other if ids is None else np.intersect1d(ids, other, assume_unique=True)
+            return len(ids)
+        _, hits = merge_runs(anchor_ids)
+        return int(np.count_nonzero(hits >= needed))
+    if needed == len(anchor_ids):
+        smallest, *others = sorted(anchor_ids, key=len)
+        return len(set(smallest).intersection(*others))
+    return sum(1 for n in Counter(chain.from_iterable(anchor_ids)).values() if n >= needed)
+
+def query_language(lang):
+    opened = open_index(lang)
+    if opened is None:
+        return None
+    db, total_lines = opened
+    t0 = time.perf_counter()
+    idiom_data, matcher = prepare_idioms(lang)
+    stops = frozenset(STOPWORDS.get(lang, ()))
+    resolved = {}  # anchor -> line ids, shared by idioms with the same anchor
+
+    for item, needed in zip(idiom_data, matcher["needed"]):
+        if needed is None:
+            continue
+        for anchor in item["anchors"]:
+            if anchor not in resolved:
+                resolved[anchor] = anchor_lines(db, anchor, stops)
+        # A repeated anchor ("damlaya damlaya") is one more list, as it is one more hit
+        item["count"] = count_matches([resolved[anchor] for anchor in item["anchors"]], needed)
+    db.close()
+    print(f"Queried {lang.upper()}: {len(idiom_data)} idioms in {time.perf_counter() - t0:.2f}s")
+    return {"lang": lang, "lines": total_lines, "data": idiom_data}
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "query"):
+        print(__doc__)
+        sys.exit(1)
+    mode = sys.argv[1]
+    langs = sys.argv[2:] or list(IDIOMS.keys())
+
+    if mode == "build":
+        for lang in langs:
+            build_index(lang)
+        return
+
+    all_results = []
+    for lang in langs:
+        res = query_language(lang)
+        if res:
+            all_results.append(res)
+    write_results(all_results)
+
+if __name__ == "__main__":
+    main()
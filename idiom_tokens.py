@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Binary tokenized corpus for the idiom miner.
+
+    python idiom_tokens.py build [lang ...]   # tokenize each corpus once (one-off)
+
+Converts {lang}.txt into four files next to it, all memory-mappable:
+
+    {lang}.tok.vocab   one token per line (UTF-8); line number = token id
+    {lang}.tok.ids     uint32 token ids, the distinct content tokens of each line
+    {lang}.tok.lines   uint32 offsets into .tok.ids, one per stored line plus the end
+                       (uint64 for corpora with more than 4G ids)
+    {lang}.tok.json    line total, corpus fingerprint and format details
+
+Only what the miner can ever match is stored: candidate lines with at least
+one content token, each as its set of non-stopword token ids. The miner then
+reads this instead of the text (idiom_miner_dictionary.py --tokens): every
+anchor becomes the set of vocabulary ids it is a prefix of, and lines are
+scored on ids alone, in blocks by BatchScorer when NumPy is installed.
+Changing the tokenizer or STOPWORDS makes the files stale; rebuild them.
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from idiom_miner_dictionary import (
+    IDIOMS, STOPWORDS, BASE_DIR, TOKENIZER_VERSION, BatchScorer, CorpusReader, corpus_fingerprint,
+    get_tokenizer, index_anchors,
+)
+
+# Config
+FORMAT_VERSION = 1
+FLUSH_IDS = 4_000_000        # Token ids buffered before a write during build
+SCORE_BLOCK = 16_000_000     # Token ids scored per NumPy step (bounds memory)
+WIDE_OFFSETS = 2**32 - 1     # Line offsets are uint32 up to here, uint64 beyond
+PREFIX_END = "\U0010ffff"    # Sorts after any token character (tokens never contain astral chars)
+
+def token_paths(lang):
+    return {ext: BASE_DIR / lang / f"{lang}.tok.{ext}" for ext in ("vocab", "ids", "lines", "json")}
+
+def stopwords_digest(lang):
+    return hashlib.sha1("\n".join(sorted(STOPWORDS.get(lang, ()))).encode("utf-8")).hexdigest()
+
+def build_tokens(lang):
+    file_path = BASE_DIR / lang / f"{lang}.txt"
+    if not file_path.exists():
+        print(f"Skipping {lang} (File not found)")
+        return
+    paths = token_paths(lang)
+    tmp = {ext: p.with_suffix(p.suffix + ".tmp") for ext, p in paths.items()}
+
+    print(f"Tokenizing {lang.upper()} -> {paths['ids'].parent}/{lang}.tok.*")
+    t0 = time.perf_counter()
+    tokenize = get_tokenizer(lang)
+    vocab = {}
+    ids = array("I")
+    offsets = array("I", [0])
+    stored = stored_lines = 0
+    reader = CorpusReader(file_path)
+    with open(tmp["ids"], "wb") as f_ids, open(tmp["lines"], "wb") as f_lines:
+        for line in reader:
+            tokens = set(tokenize(line))
+            if not tokens:
+                continue
+            for token in tokens:
+                token_id = vocab.get(token)
+                if token_id is None:
+                    vocab[token] = token_id = len(vocab)
+                ids.append(token_id)
+            stored += len(tokens)
+            stored_lines += 1
+            if stored > WIDE_OFFSETS and offsets.typecode == "I":
+                # Past 4G ids: rewrite the offsets written so far as uint64
+                offsets = array("Q", offsets)
+                f_lines.flush()
+                written = array("I")
+                with open(tmp["lines"], "rb") as f:
+                    written.frombytes(f.read())
+                f_lines.seek(0)
+                array("Q", written).tofile(f_lines)
+            offsets.append(stored)
+            if len(ids) >= FLUSH_IDS:
+                ids.tofile(f_ids)
+                offsets.tofile(f_lines)
+                del ids[:], offsets[:]
+        ids.tofile(f_ids)
+        offsets.tofile(f_lines)
+
+    with open(tmp["vocab"], "w", encoding="utf-8", newline="\n") as f:
+        for token in vocab:
+            f.write(token + "\n")
+    with open(tmp["json"], "w", encoding="utf-8") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "tokenizer": TOKENIZER_VERSION,
+            "stopwords": stopwords_digest(lang),
+            "byteorder": sys.byteorder,
+            "corpus": corpus_fingerprint(file_path),
+            "lines": reader.lines,
+            "stored_lines": stored_lines,
+            "offsets": offsets.typecode,
+            "ids": stored,
+            "vocab": len(vocab),
+        }, f)
+    for ext in ("vocab", "ids", "lines", "json"):
+        tmp[ext].replace(paths[ext])
+
+    size = sum(paths[ext].stat().st_size for ext in paths)
+    raw = file_path.stat().st_size
+    print(f"  {reader.lines:,} lines, {stored:,} ids, {len(vocab):,} types in {time.perf_counter() - t0:.1f}s; "
+          f"{size / (1024 * 1024):,.1f} MB ({size / max(raw, 1):.0%} of the text)")
+
+def open_tokens(lang):
+    """Loads a language's token corpus, or returns None (with the reason) if it is missing or stale."""
+    paths = token_paths(lang)
+    file_path = BASE_DIR / lang / f"{lang}.txt"
+    if not paths["json"].exists():
+        print(f"  no token corpus (run: idiom_tokens.py build {lang})")
+        return None
+    with open(paths["json"], "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION or meta.get("byteorder") != sys.byteorder:
+        print(f"  token corpus format {meta.get('version')} ({meta.get('byteorder')}) is not readable here; rebuild it")
+        return None
+    if meta.get("tokenizer") != TOKENIZER_VERSION or meta.get("stopwords") != stopwords_digest(lang):
+        print("  token corpus built with another tokenizer or stopword list; rebuild it")
+        return None
+    if file_path.exists() and meta.get("corpus") != corpus_fingerprint(file_path):
+        print("  corpus changed since the token corpus was built; rebuild it")
+        return None
+    with open(paths["vocab"], "r", encoding="utf-8", newline="\n") as f:
+        vocab = f.read().split("\n")[:-1]
+    return meta, vocab
+
+def anchor_groups(vocab, anchors):
+    """
+    Resolves anchors to vocabulary ids: {token id: tuple of the indices of
+    every anchor that is a prefix of the token}.
+    """
+    order = sorted(range(len(vocab)), key=vocab.__getitem__)
+    keys = [vocab[i] for i in order]
+    token_anchors = {}
+    for a, anchor in enumerate(anchors):
+        lo = bisect.bisect_left(keys, anchor)
+        hi = bisect.bisect_left(keys, anchor + PREFIX_END, lo)
+        for token_id in order[lo:hi]:
+            token_anchors.setdefault(token_id, []).append(a)
+    return {t: tuple(a) for t, a in token_anchors.items()}
+
+def _map_array(path, typecode):
+    """Read-only view of a native-order array file (kept alive by the view)."""
+    if path.stat().st_size == 0:
+        return array(typecode)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+def _score_python(paths, meta, idiom_data, anchor_idioms, token_anchors, needed):
+    ids = _map_array(paths["ids"], "I")
+    offsets = _map_array(paths["lines"], meta["offsets"])
+    counts = [0] * len(idiom_data)
+    start = offsets[0]
+    for end in offsets[1:]:
+        seen = set()
+        for token_id in ids[start:end]:
+            hit = token_anchors.get(token_id)
+            if hit:
+                seen.update(hit)
+        start = end
+        if not seen:
+            continue
+        hits = {}
+        for a in seen:
+            for idx, mult in anchor_idioms[a]:
+                hits[idx] = hits.get(idx, 0) + mult
+        for idx, n in hits.items():
+            if needed[idx] is not None and n >= needed[idx]:
+                counts[idx] += 1
+    return counts
+
+def _csr(lists):
+    """List of lists -> (flat values, start pointers) for NumPy gathers."""
+    ptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(v) for v in lists])
+    flat = np.array([x for v in lists for x in v], dtype=np.int64)
+    return flat, ptr
+
+def _expand(keys, groups, flat, ptr):
+    """Pairs every key with each member of its group: (repeated keys, members)."""
+    lengths = ptr[groups + 1] - ptr[groups]
+    rep = np.repeat(keys, lengths)
+    starts = np.repeat(ptr[groups] - np.cumsum(lengths) + lengths, lengths)
+    return rep, flat[starts + np.arange(len(rep))]
+
+def _score_numpy(paths, meta, scorer, token_anchors):
+    ids = np.memmap(paths["ids"], dtype=np.uint32, mode="r") if meta["ids"] else np.zeros(0, np.uint32)
+    offsets = np.memmap(paths["lines"], dtype=np.uint32 if meta["offsets"] == "I" else np.uint64, mode="r")
+    # Token id -> group of anchors it matches (0 = none); groups are distinct anchor tuples
+    group_of = {}
+    lut = np.zeros(meta["vocab"] + 1, dtype=np.uint32)
+    for token_id, hit in token_anchors.items():
+        lut[token_id] = group_of.setdefault(hit, len(group_of) + 1)
+    group_flat, group_ptr = _csr([()] + list(group_of))
+    n_anchors = max(len(scorer.anchors), 1)
+
+    first = 0
+    n_lines = len(offsets) - 1
+    while first < n_lines:
+        # Whole lines only, about SCORE_BLOCK ids per step
+        last = int(np.searchsorted(offsets, np.int64(int(offsets[first]) + SCORE_BLOCK), side="right")) - 1
+        last = min(max(last, first + 1), n_lines)
+        bounds = offsets[first:last + 1].astype(np.int64)
+        lo, hi = int(bounds[0]), int(bounds[-1])
+        groups = lut[ids[lo:hi]]
+        pos = np.flatnonzero(groups)
+        if len(pos):
+            # Line of each hit, relative to this block
+            line = np.searchsorted(bounds, pos + lo, side="right") - 1
+            line, anchor = _expand(line, groups[pos].astype(np.int64), group_flat, group_ptr)
+            # An anchor is a hit once per line, however many words it prefixes
+            pairs = np.unique(line * n_anchors + anchor)
+            scorer.score(pairs // n_anchors, pairs % n_anchors)
+        first = last
+    return scorer.result()
+
+def mine_tokens(lang, idiom_data, matcher):
+    """
+    Counts idiom_data from the token corpus, adding to item["count"] like
+    mine_file. Returns the line total, or None if the token corpus can't be used.
+    """
+    opened = open_tokens(lang)
+    if opened is None:
+        return None
+    meta, vocab = opened
+    anchors, anchor_idioms = index_anchors(idiom_data)
+    token_anchors = anchor_groups(vocab, anchors)
+    paths = token_paths(lang)
+    if np is not None:
+        counts = _score_numpy(paths, meta, BatchScorer(idiom_data, matcher), token_anchors)
+    else:
+        counts = _score_python(paths, meta, idiom_data, anchor_idioms, token_anchors, matcher["needed"])
+    for item, n in zip(idiom_data, counts):
+        item["count"] += n
+    return meta["lines"]
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print(__doc__)
+        sys.exit(1)
+    for lang in sys.argv[2:] or list(IDIOMS.keys()):
+        build_tokens(lang)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import random
+
+from idiom_miner_dictionary import ConcordanceSample
+
+
+def _matches(n_lines, n_idioms, seed=0):
+    """(line number, idiom index) of random matches, in file order."""
+    rng = random.Random(seed)
+    return [(line_no, idx) for line_no in range(1, n_lines + 1) for idx in range(n_idioms) if rng.random() < 0.3]
+
+
+def _add(sample, matches, first=1):
+    for line_no, idx in matches:
+        sample.add(idx, (line_no - first + 1, line_no * 10, f"line {line_no}"))
+
+
+def test_merged_first_matches_come_in_file_order():
+    matches = _matches(200, 4)
+    serial = []
+    _add(ConcordanceSample(4, cap=20, emit=lambda idx, rec: serial.append((idx, rec))), matches)
+
+    merged = []
+    whole = ConcordanceSample(4, cap=20, emit=lambda idx, rec: merged.append((idx, rec)))
+    for first, last in ((1, 50), (51, 120), (121, 200)):
+        part = ConcordanceSample(4, cap=20)
+        _add(part, [(n, idx) for n, idx in matches if first <= n <= last], first)
+        whole.merge(part, first - 1)
+
+    assert merged == serial
+    assert [rec[0] for _, rec in merged] == sorted(rec[0] for _, rec in merged)
+
+
+def test_reservoir_is_emitted_in_file_order():
+    rows = []
+    sample = ConcordanceSample(4, cap=5, reservoir=True, emit=lambda idx, rec: rows.append((rec[0], idx)))
+    _add(sample, _matches(200, 4))
+    assert not rows
+    sample.finish()
+    assert len(rows) == 20 and rows == sorted(rows)
@@ -0,0 +1,330 @@
+"""
+Download tests against local stand-ins for the OPUS mirrors: http.server
+threads serving the OPUS URL layout, one honoring Range requests and one
+that cuts response bodies short.
+"""
+import gzip
+import importlib
+import io
+import random
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+PRIMARY_PATH = "/OPUS-OpenSubtitles"
+FALLBACK_PATH = "/download.php?f=OPUS-OpenSubtitles"
+MOSES_REL = "/v2018/moses/en-tr.txt.zip"
+DATA = bytes(range(256)) * 1200  # 300 KiB
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves `files` ({path with query: bytes}), answering Range requests with 206 or 416."""
+
+    files = {}
+    honor_range = True
+    range_cap = None  # Most bytes one 206 response covers (an honest partial answer)
+    error = None      # Status sent for every request instead of the file
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        data = self.files.get(self.path)
+        if self.error or data is None:
+            self.send_error(self.error or 404)
+            return
+        requested = self.headers.get("Range")
+        if self.honor_range and requested:
+            start = int(requested.split("=")[1].split("-")[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            end = len(data) if self.range_cap is None else min(len(data), start + self.range_cap)
+            body = data[start:end]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.send_body(body)
+
+    def send_body(self, body):
+        self.wfile.write(body)
+
+
+class SlowHandler(RangeHandler):
+    """Sends the body in 4 KiB pieces with a pause after each (well under 1 MB/s)."""
+
+    def send_body(self, body):
+        for i in range(0, len(body), 4096):
+            self.wfile.write(body[i:i + 4096])
+            self.wfile.flush()
+            threading.Event().wait(0.01)  # time.sleep is patched out by the dl fixture
+
+
+class DroppingHandler(RangeHandler):
+    """Announces the full Content-Length, then closes after cut_after bytes (the first `drops` times)."""
+
+    cut_after = 50 * 1024
+    drops = None  # None: every response
+
+    def send_body(self, body):
+        if self.drops is not None:
+            if self.drops <= 0:
+                self.wfile.write(body)
+                return
+            type(self).drops -= 1
+        self.wfile.write(body[:self.cut_after])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+@pytest.fixture
+def dl(tmp_path, monkeypatch):
+    """The downloader module, working in tmp_path with fresh mirror stats and no retry sleeps."""
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("download_opensubs_dual_mirror")
+    for d in (module.OUTDIR, module.TMPDIR):
+        d.mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(module, "MIRROR_STATS", {})
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    return module
+
+
+@pytest.fixture
+def serve():
+    """serve(handler class, **class attributes) -> (server, base URL of the root)."""
+    servers = []
+
+    def start(handler, **attrs):
+        cls = type(handler.__name__, (handler,), attrs)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), cls)
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_resumes_after_dropped_connection(dl, serve, tmp_path):
+    server, root = serve(DroppingHandler, files={PRIMARY_PATH + MOSES_REL: DATA}, drops=1)
+    base = root + PRIMARY_PATH
+    dest = tmp_path / "file.zip"
+
+    assert dl.try_url(base + MOSES_REL, dest, mirror=base) == (True, 200)
+    assert dest.read_bytes() == DATA
+    assert not dest.with_name("file.zip.part").exists()
+    # The retry asked only for what was missing
+    assert server.requests[0][1] is None
+    assert server.requests[1][1] == f"bytes={DroppingHandler.cut_after}-"
+
+
+def test_restarts_when_server_ignores_range(dl, serve, tmp_path):
+    server, root = serve(RangeHandler, files={PRIMARY_PATH + MOSES_REL: DATA}, honor_range=False)
+    dest = tmp_path / "file.zip"
+    dest.with_name("file.zip.part").write_bytes(b"\xff" * 1000)  # Not a prefix of DATA
+
+    assert dl.try_url(root + PRIMARY_PATH + MOSES_REL, dest) == (True, 200)
+    assert dest.read_bytes() == DATA
+    assert server.requests == [(PRIMARY_PATH + MOSES_REL, "bytes=1000-")]
+
+
+def test_complete_part_answered_with_416_is_kept(dl, serve, tmp_path):
+    server, root = serve(RangeHandler, files={PRIMARY_PATH + MOSES_REL: DATA})
+    dest = tmp_path / "file.zip"
+    dest.with_name("file.zip.part").write_bytes(DATA)
+
+    assert dl.try_url(root + PRIMARY_PATH + MOSES_REL, dest) == (True, 200)
+    assert dest.read_bytes() == DATA
+    assert len(server.requests) == 1
+
+
+def test_oversized_part_answered_with_416_is_downloaded_again(dl, serve, tmp_path):
+    server, root = serve(RangeHandler, files={PRIMARY_PATH + MOSES_REL: DATA})
+    dest = tmp_path / "file.zip"
+    dest.with_name("file.zip.part").write_bytes(DATA + b"junk")
+
+    assert dl.try_url(root + PRIMARY_PATH + MOSES_REL, dest) == (True, 200)
+    assert dest.read_bytes() == DATA
+    assert [r for _, r in server.requests] == [f"bytes={len(DATA) + 4}-", None]
+
+
+def test_short_body_is_resumed_until_content_range_total(dl, serve, tmp_path):
+    # Honest 206 answers covering 100 KiB each: the size check must keep going
+    server, root = serve(RangeHandler, files={PRIMARY_PATH + MOSES_REL: DATA}, range_cap=100 * 1024)
+    dest = tmp_path / "file.zip"
+    dest.with_name("file.zip.part").write_bytes(DATA[:10])
+
+    assert dl.try_url(root + PRIMARY_PATH + MOSES_REL, dest) == (True, 200)
+    assert dest.read_bytes() == DATA
+    assert [r for _, r in server.requests] == [f"bytes={n}-" for n in (10, 10 + 100 * 1024, 10 + 200 * 1024)]
+
+
+def test_incomplete_download_is_never_renamed(dl, serve, tmp_path, monkeypatch):
+    monkeypatch.setattr(dl, "MAX_RETRIES", 3)
+    server, root = serve(DroppingHandler, files={PRIMARY_PATH + MOSES_REL: DATA * 4})
+    dest = tmp_path / "file.zip"
+
+    assert dl.try_url(root + PRIMARY_PATH + MOSES_REL, dest) == (False, None)
+    assert not dest.exists()
+    assert dest.with_name("file.zip.part").stat().st_size == 3 * DroppingHandler.cut_after
+
+
+def _moses_zip(lines, compression=zipfile.ZIP_STORED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as zf:
+        zf.writestr("OpenSubtitles.en-tr.txt", "".join(f"source {i} ||| hedef satır {i}\n" for i in range(lines)))
+    return buf.getvalue()
+
+
+def test_falls_back_from_primary_to_fallback(dl, serve, monkeypatch):
+    primary, primary_root = serve(RangeHandler, error=500)
+    fallback, fallback_root = serve(RangeHandler, files={FALLBACK_PATH + MOSES_REL: _moses_zip(1500)})
+    primary_base, fallback_base = primary_root + PRIMARY_PATH, fallback_root + FALLBACK_PATH
+    monkeypatch.setattr(dl, "PRIMARY_BASE", primary_base)
+    monkeypatch.setattr(dl, "FALLBACK_BASE", fallback_base)
+    monkeypatch.setattr(dl, "MIRRORS", [primary_base, fallback_base])
+    # Both already measured, primary faster: it is tried first
+    for base, mbps in ((primary_base, 100.0), (fallback_base, 1.0)):
+        dl._mirror(base)["mbps"] = mbps
+
+    row = dl.fetch_language("tr")
+
+    assert row["lines"] == 1500
+    assert row["release_used"] == "v2018" and row["pair_used"] == "moses(en-tr)"
+    assert primary.requests == [(PRIMARY_PATH + MOSES_REL, None)]
+    assert fallback.requests[0][0] == FALLBACK_PATH + MOSES_REL
+    lines = (dl.OUTDIR / "tr" / "tr.txt").read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "hedef satır 0" and len(lines) == 1500
+    assert dl.MIRROR_STATS[primary_base]["errors"] == 1
+
+
+def test_mirror_that_keeps_dropping_is_given_up(dl, serve, tmp_path, monkeypatch):
+    server, root = serve(DroppingHandler, files={PRIMARY_PATH + MOSES_REL: DATA * 4})
+    base, rival = root + PRIMARY_PATH, "http://rival.invalid"
+    dl._mirror(rival)["mbps"] = 1.0
+
+    # Every attempt delivers some bytes, which must not end the error streak
+    assert dl.try_url(base + MOSES_REL, tmp_path / "file.zip", mirror=base, rivals=[rival]) == (False, None)
+    assert len(server.requests) == dl.DEAD_AFTER
+    assert dl.MIRROR_STATS[base]["consecutive_errors"] == dl.DEAD_AFTER
+    assert dl.MIRROR_STATS[base]["transfers"] == dl.DEAD_AFTER
+
+
+def _write_corpus(dl, lang, lines):
+    path = dl.OUTDIR / lang / f"{lang}.txt"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+
+@pytest.fixture
+def mining(dl, monkeypatch):
+    import idiom_miner_dictionary
+    monkeypatch.setattr(dl, "mining", idiom_miner_dictionary)
+    monkeypatch.setattr(dl, "MINED", {})
+    monkeypatch.setattr(dl, "LANGS", ["tr", "en"])
+    return idiom_miner_dictionary
+
+
+def test_mine_covers_languages_that_were_not_streamed(dl, mining, tmp_path):
+    _write_corpus(dl, "tr", ["bugün hava çok güzel", "yarın görüşürüz"] * 50)
+    _write_corpus(dl, "en", ["hold your horses", "see you tomorrow"] * 50)
+    dl.MINED["tr"] = mining.process_language("tr")  # Streamed; en was skipped as already there
+
+    dl.write_mined_results()
+
+    report = (tmp_path / "final_research_report.txt").read_text(encoding="utf-8")
+    assert "LANGUAGE: EN" in report and "LANGUAGE: TR" in report
+    stats = (tmp_path / "final_idiom_stats.csv").read_text(encoding="utf-8")
+    assert "en,hold your horses,50," in stats
+
+
+def test_mine_refuses_a_partial_study(dl, mining, tmp_path, capsys):
+    _write_corpus(dl, "tr", ["bugün hava çok güzel"] * 50)
+    dl.MINED["tr"] = mining.process_language("tr")  # en failed to download
+
+    dl.write_mined_results()
+
+    assert "no corpus for en" in capsys.readouterr().out
+    assert not (tmp_path / "final_idiom_stats.csv").exists()
+    assert not (tmp_path / "final_research_report.txt").exists()
+
+
+def test_stream_does_not_hang_when_the_consumer_fails(dl, serve, monkeypatch):
+    monkeypatch.setattr(dl, "PIPELINE_QUEUE", 2)
+    monkeypatch.setattr(dl, "DOWNLOAD_BLOCK", 4096)
+    rng = random.Random(0)
+    text = "".join(f"{rng.getrandbits(64):x} {rng.getrandbits(64):x}\n" for _ in range(50_000))
+    server, root = serve(RangeHandler, files={"/mono.gz": gzip.compress(text.encode())})
+
+    class FailingMiner:
+        batches = 0
+
+        def feed(self, batch):
+            self.batches += 1
+            if self.batches == 3:
+                raise OSError("No space left on device")
+
+    outcome = []
+
+    def run():
+        try:
+            dl.stream_url(root + "/mono.gz", "tr", "gz", 0, miner=FailingMiner())
+        except OSError as e:
+            outcome.append(e)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(timeout=30)
+    assert not worker.is_alive(), "stream_url hung after the consumer failed"
+    assert len(outcome) == 1
+
+
+@pytest.fixture
+def slow_primary(dl, serve, monkeypatch):
+    """A slow primary with the tr Moses zip and a fast fallback without it; returns both servers."""
+    monkeypatch.setattr(dl, "DOWNLOAD_BLOCK", 4096)
+    monkeypatch.setattr(dl, "SLOW_CHECK_SECONDS", 0.02)
+    primary, primary_root = serve(SlowHandler, files={PRIMARY_PATH + MOSES_REL: _moses_zip(1500)})
+    fallback, fallback_root = serve(RangeHandler)
+    primary_base, fallback_base = primary_root + PRIMARY_PATH, fallback_root + FALLBACK_PATH
+    monkeypatch.setattr(dl, "MIRRORS", [primary_base, fallback_base])
+    return primary, primary_base, fallback, fallback_base
+
+
+def test_slow_mirror_is_kept_when_no_untried_mirror_is_left(dl, slow_primary):
+    primary, primary_base, fallback, fallback_base = slow_primary
+    # The fallback is ranked first, much faster, and lacks the file
+    for base, mbps in ((primary_base, 0.1), (fallback_base, 50.0)):
+        dl._mirror(base)["mbps"] = mbps
+
+    row = dl.fetch_language("tr")
+
+    assert row["lines"] == 1500
+    assert [r for _, r in primary.requests] == [None]
+
+
+def test_slow_mirror_resumes_after_the_faster_one_lacks_the_file(dl, slow_primary):
+    primary, primary_base, fallback, fallback_base = slow_primary
+    # Primary first, then abandoned as slow for the fallback, which has a 404 for it
+    for base, mbps in ((primary_base, 100.0), (fallback_base, 50.0)):
+        dl._mirror(base)["mbps"] = mbps
+
+    row = dl.fetch_language("tr")
+
+    assert row["lines"] == 1500
+    assert len(primary.requests) == 2 and primary.requests[0][1] is None
+    assert primary.requests[1][1].startswith("bytes=")
+    assert fallback.requests == [(FALLBACK_PATH + MOSES_REL, "bytes=" + primary.requests[1][1][6:])]
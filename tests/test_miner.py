@@ -0,0 +1,172 @@
+"""
+Regression tests for the miner: every way of scanning a corpus must give the
+counts of the plain reference loop (text-mode open(), the 5-char cutoff,
+clean_tokens and check_match per idiom).
+"""
+import random
+
+import pytest
+
+import idiom_index
+import idiom_miner_dictionary as miner
+import idiom_tokens
+
+LINE_ENDS = [b"\n"] * 8 + [b"\r\n", b"\r"]
+NOISE = ["the", "and", "bir", "ve", "yes", "ok", "köy", "sheep", "horse", "xyz", "!?", "«»", "42"]
+
+
+def _line(rng, lang):
+    """A random line: often an idiom with words dropped, suffixed, recased or mixed with noise."""
+    words = rng.choice(miner.IDIOMS[lang]).split() if rng.random() < 0.6 else []
+    words = [w for w in words if rng.random() < 0.85]
+    words = [w + rng.choice(["", "", "lar", "s", "ın"]) for w in words]
+    words += rng.sample(NOISE, rng.randrange(4))
+    rng.shuffle(words)
+    text = " ".join(words)
+    if lang == "tr" and rng.random() < 0.2:
+        # Turkish capitals: İ folds to i, I to ı
+        text = text.replace("i", "İ").upper()
+    elif rng.random() < 0.1:
+        text = text.title()
+    data = text.encode("utf-8")
+    if rng.random() < 0.05:
+        cut = rng.randrange(len(data) + 1)
+        data = data[:cut] + rng.choice([b"\xff", b"\xc3", b"\xfe\xfe", b"\xe2\x82"]) + data[cut:]
+    return data
+
+
+def _corpus(lang, n_lines, seed, final_newline=True):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n_lines):
+        r = rng.random()
+        if r < 0.08:
+            out.append(rng.choice([b"", b"ok", b"abc", b"ab\xff", b"\xc4\xb0yi"]))  # Under 5 chars ("İyi")
+        else:
+            out.append(_line(rng, lang))
+        out.append(rng.choice(LINE_ENDS))
+    if not final_newline:
+        out.pop()
+    return b"".join(out)
+
+
+def reference_counts(file_path, lang):
+    """The miner as it was first written: text mode, one check_match per idiom."""
+    anchors = [miner.get_anchors(phrase, lang) for phrase in miner.IDIOMS[lang]]
+    counts = [0] * len(anchors)
+    total = 0
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            total += 1
+            if len(line) < 5:
+                continue
+            line_tokens = miner.clean_tokens(line, lang)
+            if not line_tokens:
+                continue
+            for idx, idiom_anchors in enumerate(anchors):
+                if miner.check_match(line_tokens, idiom_anchors):
+                    counts[idx] += 1
+    return total, counts
+
+
+@pytest.fixture(params=[("en", 0, True), ("tr", 1, True), ("tr", 2, False)],
+                ids=["en", "tr", "tr-no-final-newline"])
+def corpus(request, tmp_path, monkeypatch):
+    lang, seed, final_newline = request.param
+    monkeypatch.chdir(tmp_path)
+    for module in (miner, idiom_index, idiom_tokens):
+        monkeypatch.setattr(module, "BASE_DIR", tmp_path / "by_lang")
+    path = miner.BASE_DIR / lang / f"{lang}.txt"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(_corpus(lang, 3000, seed, final_newline))
+    return lang, path
+
+
+VARIANTS = {
+    "serial": {},
+    "workers": {"workers": 3},
+    "batch": {"batch_lines": 97},
+    "workers-batch": {"workers": 2, "batch_lines": 500},
+    "no-prefilter": {"prefilter": False},
+    "dedup": {"dedup": True},
+    "dedup-workers": {"dedup": True, "workers": 2},  # Always goes through the spill files
+}
+
+
+@pytest.mark.parametrize("options", VARIANTS.values(), ids=VARIANTS.keys())
+def test_process_language_matches_reference(corpus, options, monkeypatch):
+    lang, path = corpus
+    # Small blocks, so line ends (and "\r\n" pairs) fall on block boundaries
+    monkeypatch.setattr(miner, "READ_BLOCK", 1000)
+    total, counts = reference_counts(path, lang)
+    assert sum(counts) > 100
+
+    res = miner.process_language(lang, **options)
+
+    assert res["lines"] == total
+    assert [item["count"] for item in res["data"]] == counts
+
+
+def test_token_corpus_matches_reference(corpus):
+    lang, path = corpus
+    idiom_tokens.build_tokens(lang)
+    assert idiom_tokens.open_tokens(lang) is not None  # Otherwise the text would be mined instead
+
+    res = miner.process_language(lang, tokens=True)
+
+    assert (res["lines"], [item["count"] for item in res["data"]]) == reference_counts(path, lang)
+
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["numpy", "no-numpy"])
+def test_index_query_matches_reference(corpus, numpy, monkeypatch):
+    lang, path = corpus
+    if not numpy:
+        monkeypatch.setattr(idiom_index, "np", None)
+    idiom_index.build_index(lang)
+
+    res = idiom_index.query_language(lang)
+
+    assert (res["lines"], [item["count"] for item in res["data"]]) == reference_counts(path, lang)
+
+
+def test_cached_counts_match_reference(corpus):
+    lang, path = corpus
+    cache = miner.load_cache()
+    first = miner.process_language(lang, cache=cache)
+    assert all(miner.cache_key(lang, item) in cache["entries"] for item in first["data"])
+
+    res = miner.process_language(lang, cache=cache)
+
+    assert (res["lines"], [item["count"] for item in res["data"]]) == reference_counts(path, lang)
+
+
+def test_corpus_reader_matches_text_mode(corpus, monkeypatch):
+    lang, path = corpus
+    monkeypatch.setattr(miner, "READ_BLOCK", 1000)
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        text_lines = list(f)
+    candidates = [line for line in text_lines if len(line) >= 5]
+
+    reader = miner.CorpusReader(path)
+    assert [line.rstrip("\n") for line in reader] == [line.rstrip("\n") for line in candidates]
+    assert reader.lines == len(text_lines)
+
+    reader = miner.CorpusReader(path)
+    positioned = list(reader.with_positions())
+    assert [line.rstrip("\n") for line, _, _ in positioned] == [line.rstrip("\n") for line in candidates]
+    assert [line_no for _, line_no, _ in positioned] == [i for i, line in enumerate(text_lines, 1) if len(line) >= 5]
+    assert reader.lines == len(text_lines)
+
+
+def test_split_ranges_lose_no_line(corpus):
+    lang, path = corpus
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        total = sum(1 for _ in f)
+    ranges = miner.split_ranges(path, 7)
+    lines = 0
+    for start, end in ranges:
+        reader = miner.CorpusReader(path, start, end)
+        for _ in reader:
+            pass
+        lines += reader.lines
+    assert lines == total
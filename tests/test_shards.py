@@ -0,0 +1,65 @@
+import pytest
+
+import idiom_miner_dictionary as miner
+
+CORPORA = {
+    "en": ["hold your horses", "a needle in a haystack", "nothing here"] * 40,
+    "tr": ["damlaya damlaya göl olur", "bugün hava güzel"] * 40,
+}
+
+
+@pytest.fixture
+def corpora(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(miner, "BASE_DIR", tmp_path / "by_lang")
+    monkeypatch.setattr(miner, "PARTIAL_DIR", tmp_path / "partials")
+    for lang, lines in CORPORA.items():
+        path = miner.BASE_DIR / lang / f"{lang}.txt"
+        path.parent.mkdir(parents=True)
+        path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+
+def _sharded_run(of):
+    for lang in CORPORA:
+        file_path = miner.BASE_DIR / lang / f"{lang}.txt"
+        for k in range(of):
+            res = miner.process_language(lang, shard=miner.shard_range(file_path, f"{k}/{of}"))
+            miner.write_partial(res, file_path, list(CORPORA))
+
+
+def _counts(res):
+    return res["lines"], [(item["phrase"], item["count"]) for item in res["data"]]
+
+
+def test_merged_partials_match_a_whole_run(corpora):
+    _sharded_run(3)
+
+    results, problems = miner.merge_partials([miner.PARTIAL_DIR])
+
+    assert not problems
+    assert [res["lang"] for res in results] == ["en", "tr"]
+    for res in results:
+        assert _counts(res) == _counts(miner.process_language(res["lang"]))
+
+
+def test_language_without_partials_is_a_problem(corpora):
+    _sharded_run(2)
+    for path in miner.PARTIAL_DIR.glob("tr.*"):
+        path.unlink()
+
+    results, problems = miner.merge_partials([miner.PARTIAL_DIR])
+    assert problems == ["tr: no partial results"]
+
+    # Asking for en only merges en alone
+    results, problems = miner.merge_partials([miner.PARTIAL_DIR], ["en"])
+    assert not problems and [res["lang"] for res in results] == ["en"]
+
+
+def test_missing_shard_is_a_problem(corpora):
+    _sharded_run(3)
+    next(miner.PARTIAL_DIR.glob("en.*")).unlink()
+
+    results, problems = miner.merge_partials([miner.PARTIAL_DIR])
+
+    assert [res["lang"] for res in results] == ["tr"]
+    assert any(problem.startswith("en: ") and "missing" in problem for problem in problems)